@@ -2,18 +2,49 @@
 
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
 import difflib
-import tempfile
 from streamlit_ace import st_ace
 from streamlit_webrtc import webrtc_streamer, ClientSettings, WebRtcMode
 import numpy as np
-import av
 from difflib import HtmlDiff
+try:
+    import orjson # Native JSON codec; several times faster than stdlib json on large analyze/QA payloads
+except ImportError:
+    orjson = None # Fall back to stdlib json
+try:
+    from diff_match_patch import diff_match_patch # Myers diff; much faster than difflib on large files
+except ImportError:
+    diff_match_patch = None # Fall back to difflib.HtmlDiff
+try:
+    from cdifflib import CSequenceMatcher # C SequenceMatcher for the HtmlDiff fallback
+    difflib.SequenceMatcher = CSequenceMatcher # HtmlDiff looks the matcher up on the module at call time
+except ImportError:
+    pass
+try:
+    from streamlit_autorefresh import st_autorefresh # Timed reruns for the live workflow timeline
+except ImportError:
+    st_autorefresh = None # Fall back to the manual Refresh button
 import streamlit.components.v1 as components
 import wave
+import io
+import html
+import tempfile
 import json
+import re
+import gzip
+import hashlib
+import queue
+import collections
+import math
+import urllib.parse
+import itertools
+import threading
+import time
 import logging # Import the logging module
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # --- Basic Logging Configuration ---
 # In a real production app, you might configure this more extensively
@@ -24,10 +55,51 @@ logger = logging.getLogger(__name__)
 # --- Constants ---
 SUPPORTED_SOURCE_EXTENSIONS = (".py", ".js", ".java", ".c", ".cpp", ".cs", ".go", ".rb", ".php", ".html", ".css", ".md") # Added .md
 TRACEBACK_EXTENSION = ".txt"
+LOADABLE_EXTENSIONS = SUPPORTED_SOURCE_EXTENSIONS + (TRACEBACK_EXTENSION,) # Built once; str.endswith takes the tuple directly
 DEFAULT_VOICE_SAMPLE_RATE = 16000
 DEFAULT_VOICE_SAMPLE_WIDTH = 2 # 16-bit audio
 DEFAULT_VOICE_CHANNELS = 1 # Mono
 AUDIO_PROCESSING_THRESHOLD_SECONDS = 1 # Process audio every 1 second
+AUDIO_FRAME_FORMATS = {'s16': False, 's16p': False, 'flt': True, 'fltp': True, 'f32': True, 'flt32': True} # PyAV format name -> is float
+ASR_SAMPLE_RATE = 16000 # What speech models consume; mic audio at a multiple of this is downmixed and decimated to it
+AUDIO_HOP_SECONDS = 0.32 # Size of each PCM chunk the voice worker cuts from the mic stream
+AUDIO_RECEIVER_FRAMES = 512 # Mic frames the WebRTC receiver queues for the voice worker (~10s at 20 ms per frame)
+AUDIO_WINDOW_HOPS = 25 # Ring-buffer bound on pending hops (~8s); older audio is dropped if the backend falls behind
+VOICE_MIN_COMMAND_CHARS = 3 # Shorter transcripts are ASR noise ("a", "."), not commands worth an agent call
+VOICE_IDLE_TIMEOUT_SECONDS = 30 # A live mic sends frames even in silence; this long without any means the peer is gone
+VOICE_RESULTS_REFRESH_MS = 1000 # How often the voice results area picks up new transcripts while the worker runs
+VOICE_HISTORY_SIZE = 20 # Voice results kept on screen
+DIFF_TIMEOUT_SECONDS = 1.0 # Cap on diff-match-patch work per render; it returns a coarser diff when exceeded
+DIFF_TABLE_MAX_LINES = 2000 # Above this, the difflib fallback renders a unified diff instead of HtmlDiff's intraline table
+DIFF_RENDER_CHUNK_LINES = 100 # Lines per lazily laid-out block of the inline diff
+HTTP_CONNECT_TIMEOUT = 3.05 # Slightly above a multiple of 3s, the TCP retransmit window
+HTTP_MAX_PARALLEL_REQUESTS = 8
+ANALYSIS_CACHE_SIZE = 5 # Analyze results kept per session, keyed by input content
+GZIP_MIN_BODY_BYTES = 1024 # Smaller request bodies aren't worth compressing
+GZIP_COMPRESS_LEVEL = 3 # On source-file JSON: ~15% larger than level 9's output for ~1/8 of the CPU
+WORKFLOW_STATUS_REFRESH_MS = 5000 # Live-updates poll interval for the workflow timeline
+
+# --- WebRTC ICE Servers ---
+# STUN finds a direct path; a TURN relay (set via env) is the fallback when both peers are behind symmetric NAT.
+RTC_CONFIGURATION = {"iceServers": [{"urls": ["stun:stun.l.google.com:19302"]}]}
+if os.getenv("TURN_URL"):
+    RTC_CONFIGURATION["iceServers"].append({
+        "urls": [os.getenv("TURN_URL")],
+        "username": os.getenv("TURN_USERNAME", ""),
+        "credential": os.getenv("TURN_CREDENTIAL", ""),
+    })
+
+# --- JSON Codec ---
+# Every request/response body goes through these two functions, so swapping codecs is a one-line change.
+# Both raise json.JSONDecodeError (orjson's error subclasses it) on malformed input.
+def json_dumps(obj):
+    """Serializes `obj` to UTF-8 JSON bytes."""
+    return orjson.dumps(obj) if orjson else json.dumps(obj).encode("utf-8")
+
+def json_loads(data):
+    """Parses JSON from bytes or str."""
+    return orjson.loads(data) if orjson else json.loads(data)
+
 
 # --- Import the Autonomous Workflow Tab function ---
 # IMPORTANT: This uses a relative import to a sibling directory (.screens).
@@ -67,6 +139,55 @@ if not autonomous_tab_imported and show_autonomous_tab_import_error:
         f"and __init__.py files are in the 'frontend' and ' screens' directories."
     )
 
+# --- Shared HTTP Session ---
+# One pooled session for every backend and GitHub call, so keep-alive connections are reused
+# instead of paying a TCP+TLS handshake per request. Defined after set_page_config(), which must stay the
+# first Streamlit call; show_spinner=False because worker threads (parallel_get) call cache_resource functions too.
+@st.cache_resource(show_spinner=False)
+def get_session():
+    """Process-wide requests.Session. Cached so reruns and browser sessions share one connection pool."""
+    session = requests.Session()
+    # 502-504 are what a sleeping (cold-starting) backend answers; retrying them is safe for the idempotent
+    # methods Retry allows by default, so POSTs are never replayed. After the last attempt the error response
+    # is returned rather than raised, so callers report the backend's message.
+    retry = Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504), raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter) # A local backend (BACKEND_URL=http://localhost...) gets the same pooling
+    # requests advertises "Accept-Encoding: gzip, deflate" by default, plus br when brotli is installed
+    # (it is in requirements.txt), and decodes compressed responses transparently.
+    session.headers["User-Agent"] = f"DebugIQ-frontend {session.headers['User-Agent']}" # Lets backend logs tell dashboard traffic apart
+    return session
+
+# Bound once per run so request helpers skip the cache lookup on every call.
+SESSION = get_session()
+
+@st.cache_resource(show_spinner=False)
+def get_request_executor():
+    """Process-wide pool for background backend and GitHub requests: parallel_get fan-outs and speculative QA/analysis.
+
+    Sized for a full parallel_get round next to long-running speculative LLM calls.
+    """
+    return ThreadPoolExecutor(max_workers=2 * HTTP_MAX_PARALLEL_REQUESTS)
+
+def parallel_get(urls, get=SESSION.get, timeout=30, **kwargs):
+    """GETs independent URLs concurrently so the wait is max-of-latencies instead of sum.
+
+    `urls` maps a name to a URL. Returns {name: result of `get`}, or the
+    RequestException/ValueError raised for that URL, so callers can handle each result like a serial call.
+    A number `timeout` is the read timeout and keeps HTTP_CONNECT_TIMEOUT; a (connect, read) tuple replaces both.
+    """
+    kwargs["timeout"] = timeout if isinstance(timeout, tuple) else (HTTP_CONNECT_TIMEOUT, timeout)
+    results = {}
+    executor = get_request_executor()
+    futures = {executor.submit(get, url, **kwargs): name for name, url in urls.items()}
+    for future in as_completed(futures):
+        try:
+            results[futures[future]] = future.result()
+        except (requests.exceptions.RequestException, ValueError) as e: # ValueError covers JSON decode errors
+            results[futures[future]] = e
+    return results
+
 # --- Backend URL Configuration ---
 # It's crucial to set BACKEND_URL in your production environment.
 DEFAULT_BACKEND_URL = "https://debugiq-backend.onrender.com" # Keep your default
@@ -77,24 +198,63 @@ else:
     st.sidebar.caption(f"Using backend URL: {BACKEND_URL}")
 
 
-@st.cache_data(show_spinner="Fetching backend configuration...")
+def config_cache_path(backend_url):
+    digest = hashlib.blake2b(backend_url.encode(), digest_size=8).hexdigest()
+    return os.path.join(tempfile.gettempdir(), f"debugiq_config_{digest}.json")
+
+def read_config_cache(path):
+    """Returns the {"etag", "body"} saved by a previous process, or None."""
+    try:
+        with open(path, "rb") as f:
+            return json_loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+def write_config_cache(path, etag, body):
+    try:
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(json_dumps({"etag": etag, "body": body}))
+        os.replace(f"{path}.tmp", path) # Atomic, so a concurrent reader never sees half a file
+    except OSError as e:
+        logger.warning(f"Could not cache config at {path}: {e}")
+
+@st.cache_data(show_spinner="Fetching backend configuration...", ttl=300) # Shared by all sessions; picks up backend config changes
 def fetch_config(backend_url):
-    """Fetches backend configuration. Errors are handled by the caller."""
+    """Fetches backend configuration. Errors are raised to the caller, so a failed fetch is never cached
+    and the next rerun retries instead of waiting out the TTL.
+
+    The last response is kept on disk with its ETag, so a restarted server revalidates with
+    If-None-Match and, on 304, skips the transfer and parse. It is also used if the backend is unreachable.
+    """
+    cache_path = config_cache_path(backend_url)
+    cached = read_config_cache(cache_path)
     try:
         config_url = f"{backend_url}/api/config"
         logger.info(f"Fetching config from {config_url}")
-        r = requests.get(config_url, timeout=10) # Added timeout
+        headers = {"If-None-Match": cached["etag"]} if cached and cached.get("etag") else {}
+        r = SESSION.get(config_url, headers=headers, timeout=(HTTP_CONNECT_TIMEOUT, 10))
+        if r.status_code == 304:
+            return cached["body"]
         r.raise_for_status()
-        return r.json()
+        body = json_loads(r.content)
+        if r.headers.get("ETag"):
+            write_config_cache(cache_path, r.headers["ETag"], body)
+        return body
     except requests.exceptions.RequestException as e:
         logger.error(f"Error fetching config from {backend_url}: {e}")
-        return None
-    except json.JSONDecodeError as e:
-        logger.error(f"Error decoding config JSON from {backend_url}: {e}")
-        return None
+        if cached:
+            logger.info("Using the last cached config instead.")
+            return cached["body"]
+        raise
 
 # --- Fetch and Display Config ---
-config = fetch_config(BACKEND_URL)
+try:
+    config = fetch_config(BACKEND_URL)
+except requests.exceptions.RequestException:
+    config = None # Already logged in fetch_config
+except json.JSONDecodeError as e:
+    logger.error(f"Error decoding config JSON from {BACKEND_URL}: {e}")
+    config = None
 
 if config:
     st.sidebar.info("Backend Config Loaded.")
@@ -114,6 +274,12 @@ COMMAND_URL = config.get("voice_command_url", f"{BACKEND_URL}/voice/command") if
 INBOX_URL = config.get("inbox_url", f"{BACKEND_URL}/issues/inbox") if config else f"{BACKEND_URL}/issues/inbox" # Added for consistency
 WORKFLOW_RUN_URL = config.get("workflow_run_url", f"{BACKEND_URL}/workflow/run") if config else f"{BACKEND_URL}/workflow/run"
 WORKFLOW_STATUS_URL = config.get("workflow_status_url", f"{BACKEND_URL}/workflow/status") if config else f"{BACKEND_URL}/workflow/status"
+# Request bodies are only gzipped for backends that say they can decompress them (FastAPI can't by default).
+ACCEPTS_GZIP_REQUESTS = bool(config.get("accepts_gzip_requests")) if config else False
+# Start QA on each fresh patch while the user reads the diff. Off unless the backend opts in: it doubles LLM work per analysis.
+SPECULATIVE_QA = bool(config.get("speculative_qa")) if config else False
+# Likewise start analysis as soon as inputs are loaded, hiding the LLM call behind the user's think time.
+SPECULATIVE_ANALYSIS = bool(config.get("speculative_analysis")) if config else False
 
 
 # --- Session State Initialization ---
@@ -130,24 +296,164 @@ def initialize_session_state():
             'source_files_content': {}
         },
         'qa_result': None,
+        'qa_result_payload': None, # The QA payload qa_result was computed for
         'github_repo_url_input': "", # For the text input widget
         'current_github_repo_url': None, # For tracking successfully loaded repo
         'github_branches': [],
         'github_selected_branch': None,
         'github_path_stack': [""] ,# Start at root
+        'github_etag_cache': {}, # {url: (etag, body, expires_at)} for conditional GitHub requests
+        'source_digest_cache': {}, # {file name: (content, digest)}; holds the same str objects as source_files_content
+        'processed_upload_ids': set(), # file_ids of uploads already decoded into analysis_results
         'inbox_data': None,
         'workflow_status': None,
-        'audio_buffer': b"",
-        'audio_frame_count': 0,
-        'audio_sample_rate': DEFAULT_VOICE_SAMPLE_RATE,
-        'audio_sample_width': DEFAULT_VOICE_SAMPLE_WIDTH,
-        'audio_num_channels': DEFAULT_VOICE_CHANNELS,
+        'speculative_qa': None, # {"payload", "future"} for a QA request started right after analysis
+        'analysis_cache': collections.OrderedDict(), # {analysis_cache_key(): result}, least recently used first
+        'speculative_analysis': None, # {"payload", "future"} for an analysis started when inputs changed; future is None once used
+        'workflow_status_since': None, # Server 'last_updated' of the status we hold, sent as ?since= when polling
+        'voice_worker': None, # {"receiver", "stop", "thread"} for the voice worker, kept until its thread exits
+        'voice_results': queue.Queue(), # Transcripts/replies posted by the voice worker
+        'voice_history': collections.deque(maxlen=VOICE_HISTORY_SIZE), # Results drained from voice_results, oldest first
     }
     for key, value in defaults.items():
         if key not in st.session_state:
             st.session_state[key] = value
 
 initialize_session_state()
+# The sidebar and tabs read analysis results many times per run; bind the dict once instead of going
+# through session_state each time. It is only ever mutated in place, so the binding stays current.
+analysis_results = st.session_state.analysis_results
+
+
+def source_digest(name, content, digest_cache):
+    """blake2b digest of `content`, reused while `name` still maps to the very same string object."""
+    cached = digest_cache.get(name)
+    if cached and cached[0] is content:
+        return cached[1]
+    digest = hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+    digest_cache[name] = (content, digest)
+    return digest
+
+def analysis_cache_key(analysis_results, digest_cache):
+    """Digest of the traceback plus every source file's name and content, reusing the per-file digests."""
+    source_files = analysis_results.get('source_files_content', {})
+    for name in digest_cache.keys() - source_files.keys():
+        del digest_cache[name] # Don't pin the content of files that were dropped
+    key = hashlib.blake2b((analysis_results.get('trace') or "").encode("utf-8"), digest_size=16)
+    for name, content in sorted(source_files.items()):
+        key.update(b"\0" + name.encode("utf-8") + b"\0" + source_digest(name, content, digest_cache).encode("ascii"))
+    return key.hexdigest()
+
+
+# --- GitHub API Client ---
+# Unauthenticated api.github.com calls are capped at 60/hr per IP, and Streamlit Cloud shares that IP.
+# GITHUB_TOKENS (comma-separated) raises the ceiling to 5000/hr per token by rotating through them.
+GITHUB_TOKENS = [t.strip() for t in os.getenv("GITHUB_TOKENS", "").split(",") if t.strip()]
+GITHUB_MAX_CONCURRENT_REQUESTS = 5 # Bursts above this trip GitHub's secondary rate limit
+GITHUB_REPO_URL_PATTERN = re.compile(r"^https://github\.com/([^/]+)/([^/]+?)(?:\.git)?/?$") # Compiled once, not per rerun
+GITHUB_CACHE_TTL_SECONDS = 300 # How long a cached response is served before revalidating with its ETag
+
+class GitHubTokenPool:
+    """Round-robins GitHub tokens, benching any token that is rate limited until it resets."""
+    def __init__(self, tokens):
+        self._tokens = list(tokens)
+        self._cycle = itertools.cycle(self._tokens)
+        self._benched_until = {}
+        self._lock = threading.Lock() # Shared across sessions via st.cache_resource
+
+    def next_token(self):
+        """Returns the next token that is not benched, or None if none are available."""
+        with self._lock:
+            now = time.time()
+            for _ in range(len(self._tokens)):
+                token = next(self._cycle)
+                if self._benched_until.get(token, 0) <= now:
+                    return token
+            return None
+
+    def bench(self, token, until):
+        with self._lock:
+            self._benched_until[token] = until
+
+@st.cache_resource(show_spinner=False) # Called from parallel_get worker threads
+def get_github_token_pool():
+    return GitHubTokenPool(GITHUB_TOKENS)
+
+@st.cache_resource(show_spinner=False) # Called from parallel_get worker threads
+def get_github_request_slots():
+    """Process-wide cap on in-flight GitHub requests, shared by all sessions."""
+    return threading.BoundedSemaphore(GITHUB_MAX_CONCURRENT_REQUESTS)
+
+def github_get(url, **kwargs):
+    """GETs an api.github.com or raw.githubusercontent.com URL, rotating tokens on rate limits.
+    Falls back to unauthenticated calls when no token is configured or available."""
+    pool = get_github_token_pool()
+    headers = kwargs.pop("headers", None) or {}
+    kwargs.setdefault("timeout", (HTTP_CONNECT_TIMEOUT, 10))
+    response = None
+    for _ in range(len(GITHUB_TOKENS) + 1): # One attempt per token, plus an unauthenticated last resort
+        token = pool.next_token()
+        request_headers = {**headers, "Authorization": f"Bearer {token}"} if token else headers
+        with get_github_request_slots():
+            response = SESSION.get(url, headers=request_headers, **kwargs)
+        if not token or response.status_code not in (403, 429):
+            return response
+
+        # Primary limit: X-RateLimit-Remaining hits 0. Secondary limit: Retry-After is set.
+        retry_after = response.headers.get("Retry-After")
+        if response.headers.get("X-RateLimit-Remaining") == "0":
+            bench_until = float(response.headers.get("X-RateLimit-Reset", time.time() + 60))
+        elif retry_after:
+            bench_until = time.time() + float(retry_after)
+        else:
+            return response # A genuine 403 (e.g. private repo), not a rate limit
+        logger.warning(f"GitHub token rate limited; benched for {bench_until - time.time():.0f}s.")
+        pool.bench(token, bench_until)
+    return response
+
+def github_get_json(url, etag_cache, **kwargs):
+    """GETs GitHub JSON through `etag_cache` ({url: (etag, body, expires_at)}), revalidating with If-None-Match.
+
+    A 304 costs no body and is cheap on GitHub's rate limiter, so expired entries are revalidated
+    rather than refetched. Takes the cache as an argument so it can run on worker threads.
+    """
+    now = time.time()
+    cached = etag_cache.get(url)
+    if cached and cached[2] > now:
+        return cached[1]
+
+    headers = {"If-None-Match": cached[0]} if cached and cached[0] else {}
+    response = github_get(url, headers=headers, **kwargs)
+    if response.status_code == 304:
+        if cached:
+            etag_cache[url] = (cached[0], cached[1], now + GITHUB_CACHE_TTL_SECONDS)
+            return cached[1]
+        response = github_get(url, **kwargs) # Entry was evicted meanwhile; fall back to an unconditional GET
+    response.raise_for_status()
+    body = json_loads(response.content)
+    etag_cache[url] = (response.headers.get("ETag"), body, now + GITHUB_CACHE_TTL_SECONDS)
+    return body
+
+# Branch names may contain "/", "#", "?" or "%", so refs and paths are percent-encoded before going into URLs.
+def github_contents_url(owner, repo, path, branch):
+    """Contents API URL for a directory listing on a branch."""
+    return f"https://api.github.com/repos/{owner}/{repo}/contents/{urllib.parse.quote(path)}?ref={urllib.parse.quote(branch, safe='')}"
+
+def github_tree_url(owner, repo, branch):
+    """Git trees API URL for the recursive listing of a branch."""
+    return f"https://api.github.com/repos/{owner}/{repo}/git/trees/{urllib.parse.quote(branch, safe='')}?recursive=1"
+
+def github_raw_url(owner, repo, branch, path):
+    """raw.githubusercontent.com URL for a file on a branch."""
+    return f"https://raw.githubusercontent.com/{owner}/{repo}/{urllib.parse.quote(branch, safe='')}/{urllib.parse.quote(path)}"
+
+def github_get_text(url, **kwargs):
+    """GETs a raw.githubusercontent.com file and returns its text. Raises on HTTP errors and non-UTF-8 content."""
+    response = github_get(url, **kwargs)
+    response.raise_for_status()
+    # Decode directly rather than via .text, which runs charset detection over the whole body when
+    # the Content-Type carries no charset. Source files are expected to be UTF-8, as for uploads.
+    return str(response.content, "utf-8")
 
 
 # === GitHub Repo Integration Sidebar ===
@@ -165,24 +471,67 @@ def clear_github_session_state():
     st.session_state.github_selected_branch = None
     st.session_state.github_path_stack = [""] # Reset to root
 
+def push_github_path(directory):
+    st.session_state.github_path_stack.append(directory)
+
+def expire_github_cache():
+    """Makes every cached GitHub listing revalidate on its next use; unchanged ones come back as cheap 304s."""
+    etag_cache = st.session_state.github_etag_cache
+    for url, (etag, body, _) in list(etag_cache.items()):
+        etag_cache[url] = (etag, body, 0)
+
+def pop_github_path():
+    if len(st.session_state.github_path_stack) > 1: # Never pop the root entry
+        st.session_state.github_path_stack.pop()
+
+def store_github_file(file_path, file_content):
+    """Files a loaded repo file as the traceback or as a source file, by extension."""
+    if file_path.endswith(TRACEBACK_EXTENSION):
+        analysis_results['trace'] = file_content
+        # Optionally clear source files or the specific one if it was loaded as source
+        analysis_results['source_files_content'].pop(file_path, None)
+    elif file_path.endswith(LOADABLE_EXTENSIONS): # Allow .txt also as source
+        analysis_results['source_files_content'][file_path] = file_content
+    else:
+        st.sidebar.warning(f"Ignoring '{file_path}': unsupported for analysis. Still loaded if needed by backend.")
+        # Store it anyway if needed, or handle based on strictness
+        analysis_results['source_files_content'][file_path] = file_content
+
 if repo_url_input:
     try:
-        import re
-        match = re.match(r"https://github.com/([^/]+)/([^/]+)", repo_url_input.strip())
+        match = GITHUB_REPO_URL_PATTERN.match(repo_url_input.strip())
         if match:
             owner, repo = match.groups()
 
             # Fetch branches if repo URL changed or branches not loaded
             if st.session_state.current_github_repo_url != repo_url_input or not st.session_state.github_branches:
                 st.session_state.current_github_repo_url = repo_url_input # Store attempted URL
-                api_branches_url = f"https://api.github.com/repos/{owner}/{repo}/branches"
+                api_repo_url = f"https://api.github.com/repos/{owner}/{repo}"
+                api_branches_url = f"{api_repo_url}/branches"
                 logger.info(f"Fetching branches from {api_branches_url}")
+                # The repo metadata (for the default branch) and the default branch's root listing
+                # don't depend on the branch list, so all three requests go out together.
+                etag_cache = st.session_state.github_etag_cache
+                prefetched = parallel_get(
+                    {"repo": api_repo_url, "branches": api_branches_url, "root": f"{api_repo_url}/contents/"},
+                    get=lambda url, **kwargs: github_get_json(url, etag_cache, **kwargs)
+                )
                 try:
-                    branches_res = requests.get(api_branches_url, timeout=10)
-                    branches_res.raise_for_status()
-                    st.session_state.github_branches = [b["name"] for b in branches_res.json()]
+                    branches_data = prefetched["branches"]
+                    if isinstance(branches_data, Exception):
+                        raise branches_data
+                    st.session_state.github_branches = [b["name"] for b in branches_data]
                     if st.session_state.github_branches:
-                        st.session_state.github_selected_branch = st.session_state.github_branches[0]
+                        repo_data, root_entries = prefetched["repo"], prefetched["root"]
+                        default_branch = None if isinstance(repo_data, Exception) else repo_data.get("default_branch")
+                        if default_branch in st.session_state.github_branches:
+                            st.session_state.github_selected_branch = default_branch
+                            if not isinstance(root_entries, Exception):
+                                # File the prefetched listing under the URL the root view reads, so the
+                                # cache TTL and "Refresh listing" govern it like any other listing.
+                                etag_cache[github_contents_url(owner, repo, "", default_branch)] = etag_cache[f"{api_repo_url}/contents/"]
+                        else:
+                            st.session_state.github_selected_branch = st.session_state.github_branches[0]
                         st.session_state.github_path_stack = [""] # Reset path on new repo/branch list
                         st.sidebar.success(f"Repo '{owner}/{repo}' branches loaded.")
                     else:
@@ -203,19 +552,18 @@ if repo_url_input:
                 key="github_branch_select"
             )
             st.session_state.github_selected_branch = selected_branch # Update selected branch in state
+            # Listings are served from the ETag cache for GITHUB_CACHE_TTL_SECONDS; this picks up pushes sooner.
+            st.sidebar.button("🔄 Refresh listing", key="github_refresh_button", on_click=expire_github_cache)
 
             if selected_branch:
                 path_stack = st.session_state.github_path_stack
                 current_path = "/".join([p for p in path_stack if p]) # current_path should not start with / for GitHub API
 
-                @st.cache_data(ttl=300, show_spinner=f"Fetching content for {current_path or 'root'}...") # Cache for 5 mins
                 def fetch_github_directory_content(api_owner, api_repo, path, branch):
-                    content_url = f"https://api.github.com/repos/{api_owner}/{api_repo}/contents/{path}?ref={branch}"
+                    content_url = github_contents_url(api_owner, api_repo, path, branch)
                     logger.info(f"Fetching GitHub content from: {content_url}")
                     try:
-                        content_res = requests.get(content_url, timeout=10)
-                        content_res.raise_for_status()
-                        return content_res.json()
+                        return github_get_json(content_url, st.session_state.github_etag_cache)
                     except requests.exceptions.RequestException as e:
                         st.sidebar.warning(f"Cannot fetch content for '{path}' ({e}).")
                         return None
@@ -223,52 +571,71 @@ if repo_url_input:
                         st.sidebar.warning(f"Error decoding content JSON for '{path}': {e}.")
                         return None
 
-                entries = fetch_github_directory_content(owner, repo, current_path, selected_branch)
+                with st.spinner(f"Fetching content for {current_path or 'root'}..."):
+                    entries = fetch_github_directory_content(owner, repo, current_path, selected_branch)
 
                 if entries is not None:
                     dirs = sorted([e["name"] for e in entries if e["type"] == "dir"])
                     files = sorted([e["name"] for e in entries if e["type"] == "file"])
 
+                    # Navigation runs in on_click callbacks, which apply before the rerun the click already
+                    # triggers. Rapid clicks then cost one script run each instead of two (click + st.rerun()).
                     st.sidebar.markdown("##### 📁 Navigate")
                     if current_path: # Only show ".." if not in the root
-                        if st.sidebar.button("..", key="github_up_dir", use_container_width=True):
-                            st.session_state.github_path_stack.pop()
-                            st.rerun()
+                        st.sidebar.button("..", key="github_up_dir", use_container_width=True, on_click=pop_github_path)
 
                     for d in dirs:
-                        if st.sidebar.button(f"📁 {d}", key=f"github_dir_{d.replace('.', '_')}", use_container_width=True): # Make key safer
-                            st.session_state.github_path_stack.append(d)
-                            st.rerun()
+                        st.sidebar.button(f"📁 {d}", key=f"github_dir_{d.replace('.', '_')}", use_container_width=True, on_click=push_github_path, args=(d,)) # Make key safer
 
                     st.sidebar.markdown("##### 📄 Files")
                     for f_name in files:
                         if st.sidebar.button(f"📄 {f_name}", key=f"github_file_{f_name.replace('.', '_')}", use_container_width=True): # Make key safer
                             file_path_for_url = f"{current_path}/{f_name}".strip("/")
-                            file_url = f"https://raw.githubusercontent.com/{owner}/{repo}/{selected_branch}/{file_path_for_url}"
+                            file_url = github_raw_url(owner, repo, selected_branch, file_path_for_url)
                             logger.info(f"Fetching file content from: {file_url}")
                             try:
-                                file_content_res = requests.get(file_url, timeout=10)
-                                file_content_res.raise_for_status()
-                                file_content = file_content_res.text
+                                file_content = github_get_text(file_url)
                                 st.sidebar.success(f"Loaded: {f_name}")
-
-                                full_file_path_in_repo = os.path.join(current_path, f_name).replace("\\", "/") if current_path else f_name
-
-                                if f_name.endswith(TRACEBACK_EXTENSION):
-                                    st.session_state.analysis_results['trace'] = file_content
-                                    # Optionally clear source files or the specific one if it was loaded as source
-                                    st.session_state.analysis_results['source_files_content'].pop(full_file_path_in_repo, None)
-                                elif f_name.endswith(SUPPORTED_SOURCE_EXTENSIONS + (TRACEBACK_EXTENSION,)): # Allow .txt also as source
-                                    st.session_state.analysis_results['source_files_content'][full_file_path_in_repo] = file_content
-                                else:
-                                    st.sidebar.warning(f"Ignoring '{f_name}': unsupported for analysis. Still loaded if needed by backend.")
-                                    # Store it anyway if needed, or handle based on strictness
-                                    st.session_state.analysis_results['source_files_content'][full_file_path_in_repo] = file_content
-
+                                store_github_file(file_path_for_url, file_content)
                             except requests.exceptions.RequestException as e:
                                 st.sidebar.error(f"Failed to load file {f_name}: {e}")
+                            except UnicodeDecodeError:
+                                st.sidebar.error(f"Could not decode '{f_name}'. Only UTF-8 text files can be loaded.")
                 else:
                     st.sidebar.warning("Could not list files in this directory.")
+
+                # One recursive tree listing covers the whole branch, so loading several files costs
+                # one metadata call plus parallel raw fetches instead of a directory walk and a click per file.
+                # It can be large, so it is only fetched (and the multiselect built) once the user opts in.
+                if st.sidebar.checkbox("Load several files", key="github_batch_open"):
+                    tree_url = github_tree_url(owner, repo, selected_branch)
+                    try:
+                        with st.spinner("Fetching repository tree..."):
+                            tree = github_get_json(tree_url, st.session_state.github_etag_cache)
+                    except (requests.exceptions.RequestException, ValueError) as e:
+                        tree = None
+                        logger.warning(f"Could not fetch repo tree from {tree_url}: {e}")
+                        st.sidebar.warning("Could not list the repository tree.")
+                    if tree:
+                        loadable_paths = [
+                            e["path"] for e in tree.get("tree", [])
+                            if e["type"] == "blob" and e["path"].endswith(LOADABLE_EXTENSIONS)
+                        ]
+                        selected_paths = st.sidebar.multiselect("Files to load", loadable_paths, key="github_batch_files")
+                        if selected_paths and st.sidebar.button("⬇️ Load selected files", key="github_batch_load", use_container_width=True):
+                            with st.spinner(f"Loading {len(selected_paths)} files..."):
+                                loaded = parallel_get(
+                                    {path: github_raw_url(owner, repo, selected_branch, path) for path in selected_paths},
+                                    get=github_get_text
+                                )
+                            for path in selected_paths:
+                                if isinstance(loaded[path], Exception):
+                                    st.sidebar.error(f"Failed to load file {path}: {loaded[path]}")
+                                else:
+                                    store_github_file(path, loaded[path])
+                            st.sidebar.success(f"Loaded {sum(not isinstance(v, Exception) for v in loaded.values())} of {len(selected_paths)} files.")
+                        if tree.get("truncated"):
+                            st.sidebar.caption("Repository tree is too large to list in full; browse folders above for the rest.")
             elif branches: # Branches exist but none selected (should not happen with current logic if branches exist)
                 st.sidebar.info("Select a branch to browse files.")
         else:
@@ -286,23 +653,28 @@ st.markdown("---")
 st.markdown("### ⬆️ Upload Files Manually")
 uploaded_files = st.file_uploader(
     "📄 Upload traceback (.txt) + source files (.py, .js, etc.)",
-    type=[ext.lstrip('.') for ext in SUPPORTED_SOURCE_EXTENSIONS + (TRACEBACK_EXTENSION,)], # Use constants
+    type=[ext.lstrip('.') for ext in LOADABLE_EXTENSIONS], # Use constants
     accept_multiple_files=True,
     key="manual_file_uploader"
 )
 
-if uploaded_files:
+# The uploader keeps returning the same files on every rerun; decode each upload only once.
+new_uploaded_files = [file for file in uploaded_files or [] if file.file_id not in st.session_state.processed_upload_ids]
+# Forget uploads the user removed (a re-added file gets a fresh file_id), so the set tracks only what's in the widget.
+st.session_state.processed_upload_ids.intersection_update(file.file_id for file in uploaded_files or [])
+if new_uploaded_files:
     trace_content_upload = None
     source_files_content_upload = {}
     files_loaded_summary = []
 
-    for file in uploaded_files:
+    for file in new_uploaded_files:
+        st.session_state.processed_upload_ids.add(file.file_id) # Failed decodes aren't retried until re-uploaded
         try:
-            content = file.getvalue().decode("utf-8")
+            content = str(file.getbuffer(), "utf-8") # Decodes straight from the upload buffer, no intermediate bytes copy
             if file.name.endswith(TRACEBACK_EXTENSION):
                 trace_content_upload = content
                 files_loaded_summary.append(f"Traceback: {file.name}")
-            elif file.name.endswith(SUPPORTED_SOURCE_EXTENSIONS + (TRACEBACK_EXTENSION,)): # Allow .txt as source too
+            elif file.name.endswith(LOADABLE_EXTENSIONS): # Allow .txt as source too
                 source_files_content_upload[file.name] = content # Use original filename as key
                 files_loaded_summary.append(f"Source: {file.name}")
             else:
@@ -317,14 +689,14 @@ if uploaded_files:
     # Update session state if files were successfully processed
     if trace_content_upload is not None or source_files_content_upload:
         if trace_content_upload is not None:
-            st.session_state.analysis_results['trace'] = trace_content_upload
+            analysis_results['trace'] = trace_content_upload
             # Clear previous source files when a new trace is uploaded, this is a design choice
-            # st.session_state.analysis_results['source_files_content'] = {}
+            # analysis_results['source_files_content'] = {}
 
         if source_files_content_upload:
             # Merge uploaded source files with existing ones, or replace
-            # Current: Update/Merge. To replace: st.session_state.analysis_results['source_files_content'] = source_files_content_upload
-            st.session_state.analysis_results['source_files_content'].update(source_files_content_upload)
+            # Current: Update/Merge. To replace: analysis_results['source_files_content'] = source_files_content_upload
+            analysis_results['source_files_content'].update(source_files_content_upload)
 
         # Clear GitHub state as manual upload takes precedence
         st.session_state.github_repo_url_input = "" # Clear the text input
@@ -335,13 +707,13 @@ if uploaded_files:
 
 # --- Display current Trace and Source Files (for visibility) ---
 with st.sidebar.expander("📬 Loaded Analysis Inputs", expanded=False):
-    if st.session_state.analysis_results.get('trace'):
-        st.text_area("Current Traceback:", value=st.session_state.analysis_results['trace'], height=100, disabled=True, key="sidebar_trace_display")
+    if analysis_results.get('trace'):
+        st.text_area("Current Traceback:", value=analysis_results['trace'], height=100, disabled=True, key="sidebar_trace_display")
     else:
         st.caption("No traceback loaded.")
-    if st.session_state.analysis_results.get('source_files_content'):
+    if analysis_results.get('source_files_content'):
         st.write("Current Source Files:")
-        for name, _ in st.session_state.analysis_results['source_files_content'].items():
+        for name, _ in analysis_results['source_files_content'].items():
             st.caption(f"- {name}")
     else:
         st.caption("No source files loaded.")
@@ -359,13 +731,43 @@ tab_titles = [
 tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(tab_titles)
 
 # --- Helper function for API calls ---
-def make_api_request(method, url, json_payload=None, expected_status=200, operation_name="API"):
+def encode_json_body(payload, compress=False):
+    """Request kwargs for a JSON body; gzipped when `compress` is set and the body is large enough to benefit."""
+    if payload is None:
+        return {}
+    body = json_dumps(payload)
+    if not compress or len(body) < GZIP_MIN_BODY_BYTES:
+        return {"data": body, "headers": {"Content-Type": "application/json"}}
+    return {
+        "data": gzip.compress(body, compresslevel=GZIP_COMPRESS_LEVEL),
+        "headers": {"Content-Type": "application/json", "Content-Encoding": "gzip"},
+    }
+
+def send_api_request(method, url, json_payload=None, compress=False):
+    """Sends a backend request. Returns the response, or the RequestException raised in its place. Thread-safe."""
     try:
-        logger.info(f"Making {method} request to {url} for {operation_name} with payload: {json_payload if json_payload else 'No payload'}")
-        response = requests.request(method, url, json=json_payload, timeout=30) # General timeout
+        return SESSION.request(method, url, timeout=(HTTP_CONNECT_TIMEOUT, 30), **encode_json_body(json_payload, compress)) # General timeout
+    except requests.exceptions.RequestException as e:
+        return e
+
+def submit_api_request(method, url, json_payload=None, compress=False):
+    """Starts send_api_request in the background. Pass the future's result to parse_api_response on the script thread."""
+    logger.info(f"Submitting background {method} request to {url}")
+    return get_request_executor().submit(send_api_request, method, url, json_payload, compress)
+
+def make_api_request(method, url, json_payload=None, expected_status=200, operation_name="API", compress=False):
+    logger.info(f"Making {method} request to {url} for {operation_name} with payload: {json_payload if json_payload else 'No payload'}")
+    response = send_api_request(method, url, json_payload, compress)
+    return parse_api_response(response, url, expected_status=expected_status, operation_name=operation_name)
+
+def parse_api_response(response, url, expected_status=200, operation_name="API"):
+    """Decodes a backend response, or reports the RequestException raised in its place. Returns None on failure."""
+    try:
+        if isinstance(response, Exception):
+            raise response
         response.raise_for_status() # Raises HTTPError for 4xx/5xx
         if response.status_code == expected_status:
-            return response.json()
+            return json_loads(response.content)
         else: # Should be caught by raise_for_status, but as a fallback
             logger.error(f"{operation_name} failed with status {response.status_code}: {response.text}")
             st.error(f"{operation_name} request failed: {response.status_code} - {response.text}")
@@ -374,36 +776,157 @@ def make_api_request(method, url, json_payload=None, expected_status=200, operat
         logger.error(f"HTTP error during {operation_name} to {url}: {e}. Response: {e.response.text if e.response else 'No response text'}")
         st.error(f"{operation_name} failed: {e}. Details: {e.response.text if e.response else 'Server did not provide details.'}")
         return None
+    except requests.exceptions.Timeout as e:
+        logger.error(f"Timeout during {operation_name} to {url}: {e}")
+        st.error(f"{operation_name} timed out: the backend is slow or still waking up. Please try again in a moment.")
+        return None
     except requests.exceptions.RequestException as e:
         logger.error(f"RequestException during {operation_name} to {url}: {e}")
         st.error(f"Error communicating with backend for {operation_name}: {e}")
         return None
     except json.JSONDecodeError as e:
-        logger.error(f"JSONDecodeError during {operation_name} from {url}: {e}. Response text: {response.text if 'response' in locals() else 'N/A'}")
+        logger.error(f"JSONDecodeError during {operation_name} from {url}: {e}. Response text: {response.text}")
         st.error(f"Could not parse {operation_name} response from server: {e}")
         return None
 
 
+DIFF_OP_TAGS = {
+    1: ('<ins style="background:#e6ffe6;">', '</ins>'), # diff_match_patch.DIFF_INSERT
+    -1: ('<del style="background:#ffe6e6;">', '</del>'), # diff_match_patch.DIFF_DELETE
+    0: ('', ''), # diff_match_patch.DIFF_EQUAL
+}
+
+UNIFIED_DIFF_COLORS = {"+": "#e6ffe6", "-": "#ffe6e6", "@": "#eef3ff"} # Line-prefix backgrounds for the large-file diff
+
+def render_diff_chunks(diffs):
+    """Renders diff_main output as blocks of DIFF_RENDER_CHUNK_LINES lines with `content-visibility: auto`,
+    so the browser only lays out the blocks in view instead of the whole file up front.
+
+    Unlike diff_prettyHtml, every tag opens and closes within one line, so the output can be cut at any line.
+    """
+    lines = [[]]
+    for op, text in diffs:
+        open_tag, close_tag = DIFF_OP_TAGS[op]
+        for i, piece in enumerate(text.split("\n")):
+            if i:
+                if op:
+                    lines[-1].append(f"{open_tag}&para;{close_tag}") # Make added/removed line breaks visible
+                lines.append([])
+            if piece:
+                lines[-1].append(f"{open_tag}{html.escape(piece)}{close_tag}")
+    placeholder_height = DIFF_RENDER_CHUNK_LINES * 6 // 5 # em, at the default ~1.2 line height
+    return "".join(
+        f'<div style="content-visibility: auto; contain-intrinsic-size: auto {placeholder_height}em;">'
+        + "\n".join("".join(line) for line in lines[start:start + DIFF_RENDER_CHUNK_LINES])
+        + "</div>"
+        for start in range(0, len(lines), DIFF_RENDER_CHUNK_LINES)
+    )
+
+@st.cache_data(show_spinner=False, ttl=3600, max_entries=32) # Bounded: each entry holds two files plus their HTML
+def render_html_diff(original, patched):
+    """HTML diff of the patch. Memoized because diffing is expensive and tab1 reruns on every interaction.
+
+    Uses diff-match-patch (inline, semantically cleaned-up) when installed, else difflib's side-by-side table.
+    """
+    if diff_match_patch is not None:
+        dmp = diff_match_patch()
+        dmp.Diff_Timeout = DIFF_TIMEOUT_SECONDS
+        diffs = dmp.diff_main(original, patched) # Line-mode speedup kicks in automatically for long texts
+        dmp.diff_cleanupSemantic(diffs)
+        return f'<div style="font-family: monospace; font-size: 13px; white-space: pre-wrap;">{render_diff_chunks(diffs)}</div>'
+
+    original_lines = original.splitlines(keepends=True)
+    patched_lines = patched.splitlines(keepends=True)
+    if max(len(original_lines), len(patched_lines)) > DIFF_TABLE_MAX_LINES:
+        # HtmlDiff runs an intraline ndiff over every changed region, which takes seconds on large files.
+        # A plain unified diff only needs the line matching.
+        unified = difflib.unified_diff(original_lines, patched_lines, "Original", "Patched", n=3)
+        # A last line without a newline would otherwise run into the next diff line.
+        unified = (line if line.endswith("\n") else line + "\n" for line in unified)
+        return '<pre style="font-size: 13px;">' + "".join(
+            f'<span style="background:{UNIFIED_DIFF_COLORS.get(line[:1], "transparent")};">{html.escape(line)}</span>'
+            for line in unified
+        ) + "</pre>"
+
+    html_diff_generator = HtmlDiff(wrapcolumn=70) # Optional: wrapcolumn
+    return html_diff_generator.make_table(
+        original_lines,
+        patched_lines,
+        "Original", "Patched", context=True, numlines=3
+    )
+
+
+# --- Prefetch tab data in parallel ---
+# The inbox and workflow status tabs render on every run, so fetch whatever they are missing in one round.
+prefetched_tab_data = parallel_get({
+    name: url for name, url, state_key in (
+        ("inbox", INBOX_URL, "inbox_data"),
+        ("workflow_status", WORKFLOW_STATUS_URL, "workflow_status"),
+    ) if st.session_state[state_key] is None
+})
+
+
+def build_analysis_payload(analysis_results):
+    """Stateless analyze request body with every loaded source file. Snapshots the files like build_qa_payload."""
+    return {
+        "trace": analysis_results.get('trace'),
+        "language": "python", # TODO: Make this configurable if other languages are supported
+        "config": {}, # Pass relevant runtime config if any
+        "source_files": dict(analysis_results.get('source_files_content', {})),
+    }
+
+def build_qa_payload(analysis_results):
+    """QA request body for the current analysis. Snapshots the source files so a queued payload can be compared later."""
+    return {
+        "trace": analysis_results.get('trace'),
+        "patch": analysis_results.get('patch'), # This is the potentially edited patch
+        "language": "python", # TODO: Configurable
+        "source_files": dict(analysis_results.get('source_files_content', {})),
+        "patched_file_name": analysis_results.get('patched_file_name')
+    }
+
 with tab1: # Patch Tab
     st.subheader("Traceback Analysis + Patch")
-    if st.button("🧠 Run DebugIQ Analysis", key="run_analysis_button", type="primary"):
-        trace_content = st.session_state.analysis_results.get('trace')
-        source_files = st.session_state.analysis_results.get('source_files_content', {})
-
-        if not trace_content and not source_files:
+    if SPECULATIVE_ANALYSIS:
+        # Restart the speculative analysis whenever the inputs change, so a stale one is never used.
+        analysis_payload = build_analysis_payload(analysis_results)
+        speculative_analysis = st.session_state.speculative_analysis
+        if (analysis_payload["trace"] or analysis_payload["source_files"]) and (speculative_analysis is None or speculative_analysis["payload"] != analysis_payload):
+            st.session_state.speculative_analysis = {
+                "payload": analysis_payload,
+                "future": submit_api_request("POST", ANALYZE_URL, json_payload=analysis_payload, compress=ACCEPTS_GZIP_REQUESTS),
+            }
+
+    # A form, so toggling the checkbox doesn't rerun the whole script; both values arrive with one submit.
+    with st.form("analyze_form"):
+        force_fresh_analysis = st.checkbox("Re-run even if the inputs haven't changed", key="force_fresh_analysis")
+        run_analysis = st.form_submit_button("🧠 Run DebugIQ Analysis", type="primary")
+    if run_analysis:
+        payload = build_analysis_payload(analysis_results)
+
+        if not payload["trace"] and not payload["source_files"]:
             st.warning("Please upload a traceback or source files first.")
         else:
             with st.spinner("🤖 Analyzing with DebugIQ Engine..."):
-                payload = {
-                    "trace": trace_content,
-                    "language": "python", # TODO: Make this configurable if other languages are supported
-                    "config": {}, # Pass relevant runtime config if any
-                    "source_files": source_files
-                }
-                result = make_api_request("POST", ANALYZE_URL, json_payload=payload, operation_name="DebugIQ Analysis")
+                analysis_cache = st.session_state.analysis_cache
+                cache_key = analysis_cache_key(analysis_results, st.session_state.source_digest_cache)
+                speculative_analysis = st.session_state.speculative_analysis
+                if cache_key in analysis_cache and not force_fresh_analysis:
+                    # Same traceback and files as an earlier run: skip the LLM call entirely.
+                    result = analysis_cache[cache_key]
+                    analysis_cache.move_to_end(cache_key)
+                    st.caption("Inputs unchanged since an earlier analysis; reusing its result.")
+                elif speculative_analysis and speculative_analysis["future"] and speculative_analysis["payload"] == payload:
+                    future, speculative_analysis["future"] = speculative_analysis["future"], None # Used once; payload kept so it isn't resubmitted
+                    result = parse_api_response(future.result(), ANALYZE_URL, operation_name="DebugIQ Analysis")
+                else:
+                    result = make_api_request("POST", ANALYZE_URL, json_payload=payload, operation_name="DebugIQ Analysis", compress=ACCEPTS_GZIP_REQUESTS)
 
                 if result:
-                    st.session_state.analysis_results.update({
+                    analysis_cache[cache_key] = result
+                    while len(analysis_cache) > ANALYSIS_CACHE_SIZE:
+                        analysis_cache.popitem(last=False)
+                    analysis_results.update({
                         'patch': result.get("patch"),
                         'explanation': result.get("explanation"),
                         'doc_summary': result.get("doc_summary"),
@@ -412,29 +935,31 @@ with tab1: # Patch Tab
                     })
                     st.success("✅ Analysis complete. Patch generated.")
                     logger.info("Analysis successful, results updated in session state.")
+                    st.session_state.speculative_qa = None
+                    if SPECULATIVE_QA and analysis_results['patch'] is not None and analysis_results['patched_file_name']:
+                        # QA's round-trip overlaps the user reading the diff; tab2 uses it if the patch is still unedited.
+                        qa_payload = build_qa_payload(analysis_results)
+                        st.session_state.speculative_qa = {
+                            "payload": qa_payload,
+                            "future": submit_api_request("POST", QA_URL, json_payload=qa_payload, compress=ACCEPTS_GZIP_REQUESTS),
+                        }
                 else:
                     # Clear previous successful results if analysis fails
-                    st.session_state.analysis_results.update({
+                    analysis_results.update({
                         'patch': None, 'explanation': None, 'doc_summary': None,
                         'patched_file_name': None, 'original_patched_file_content': None
                     })
                     st.error("Analysis failed. See error message above or check logs.")
 
     # Display Patch Diff and Editor
-    if st.session_state.analysis_results.get('patch') or st.session_state.analysis_results.get('original_patched_file_content'):
+    original_content = analysis_results.get('original_patched_file_content', '')
+    patched_content_from_api = analysis_results.get('patch', '') # The one from API, or the user's last applied edit
+    if patched_content_from_api or original_content:
         st.markdown("### 🔍 Patch Diff")
-        original_content = st.session_state.analysis_results.get('original_patched_file_content', '')
-        patched_content_from_api = st.session_state.analysis_results.get('patch', '') # The one from API
 
         if original_content and patched_content_from_api and original_content != patched_content_from_api:
             try:
-                html_diff_generator = HtmlDiff(wrapcolumn=70) # Optional: wrapcolumn
-                html_diff_output = html_diff_generator.make_table(
-                    original_content.splitlines(keepends=True),
-                    patched_content_from_api.splitlines(keepends=True),
-                    "Original", "Patched", context=True, numlines=3
-                )
-                components.html(html_diff_output, height=400, scrolling=True)
+                components.html(render_html_diff(original_content, patched_content_from_api), height=400, scrolling=True)
             except Exception as e:
                 st.error(f"Could not generate diff view: {e}")
                 logger.exception("Error generating HTML diff")
@@ -443,8 +968,11 @@ with tab1: # Patch Tab
                     st.text_area("Original Content (Fallback)", value=original_content, height=300, disabled=True, key="orig_content_fallback")
                 with col2:
                     st.text_area("Patched Content (Fallback)", value=patched_content_from_api, height=300, disabled=True, key="patch_content_fallback")
-        elif patched_content_from_api: # Only patch exists, or it's identical to original (no diff)
-            st.info("Generated patch content shown below (no difference from original or original not available for diff).")
+        elif original_content and patched_content_from_api == original_content:
+            # Nothing to diff; skip the diff render entirely.
+            st.info("No changes: the patch is identical to the original file.")
+        elif patched_content_from_api: # Only patch exists, original not available for diff
+            st.info("Generated patch content shown below (original not available for diff).")
             st.text_area("Generated Patch", value=patched_content_from_api, height=300, disabled=True, key="patch_only_display")
         elif original_content:
             st.info("Original content loaded, but no patch has been generated yet or an error occurred.")
@@ -456,51 +984,49 @@ with tab1: # Patch Tab
         if patched_content_from_api is not None: # Check if patch key exists and is not None
             st.markdown("### ✏️ Edit Patch")
             # The editor takes the API patch as its initial value.
-            # If the user edits it, st.session_state.analysis_results['patch'] will be updated.
+            # If the user edits it, analysis_results['patch'] will be updated.
             edited_patch = st_ace(
-                value=st.session_state.analysis_results.get('patch', ''), # Use current session state value (could be edited)
+                value=patched_content_from_api, # Current session state value (could be edited)
                 language="python", # TODO: Make configurable if language changes
                 theme="monokai",
                 height=300,
                 key="patch_editor_ace",
-                auto_update=True # Updates session state on change if widget value is assigned to session state elsewhere
+                auto_update=False # Edits are sent (and the script reruns) only on the editor's Apply / Ctrl+Enter, not per keystroke
             )
             # Update session state if editor content has changed from what's currently in the session state (originating from API or previous edit)
-            if edited_patch != st.session_state.analysis_results.get('patch'):
-                st.session_state.analysis_results['patch'] = edited_patch
+            if edited_patch != patched_content_from_api:
+                analysis_results['patch'] = edited_patch
                 # st.experimental_rerun() # Usually not needed with st_ace if auto_update handles binding well
                 st.caption("Patch updated with your edits.")
 
 
         st.markdown("### 💬 Explanation")
-        explanation = st.session_state.analysis_results.get('explanation', 'No explanation available.')
+        explanation = analysis_results.get('explanation', 'No explanation available.')
         st.text_area("Patch Explanation", value=explanation, height=150, disabled=True, key="explanation_display")
 
 with tab2: # QA Tab
     st.subheader("Run Quality Assurance on Patch")
     if st.button("🛡️ Run QA on Patch", key="run_qa_button"):
-        current_patch_content = st.session_state.analysis_results.get('patch') # This is the potentially edited patch
-        original_trace = st.session_state.analysis_results.get('trace')
-        source_files = st.session_state.analysis_results.get('source_files_content', {})
-        patched_file_name = st.session_state.analysis_results.get('patched_file_name')
+        payload = build_qa_payload(analysis_results)
 
-        if current_patch_content is None: # Check for None explicitly
+        if payload["patch"] is None: # Check for None explicitly
             st.warning("Please run analysis and generate/edit a patch first.")
-        elif not patched_file_name:
+        elif not payload["patched_file_name"]:
             st.warning("Patched file name is missing from analysis results. Please re-run analysis.")
+        elif st.session_state.qa_result and st.session_state.qa_result_payload == payload:
+            st.info("The patch hasn't changed since the last QA run; showing that result.") # Repeat clicks don't re-run QA
         else:
             with st.spinner("🛡️ Running QA on the patch..."):
-                payload = {
-                    "trace": original_trace,
-                    "patch": current_patch_content,
-                    "language": "python", # TODO: Configurable
-                    "source_files": source_files,
-                    "patched_file_name": patched_file_name
-                }
-                qa_data = make_api_request("POST", QA_URL, json_payload=payload, operation_name="QA")
+                speculative_qa = st.session_state.speculative_qa
+                st.session_state.speculative_qa = None # A speculative result is used at most once
+                if speculative_qa and speculative_qa["payload"] == payload: # Nothing was edited since analysis
+                    qa_data = parse_api_response(speculative_qa["future"].result(), QA_URL, operation_name="QA")
+                else:
+                    qa_data = make_api_request("POST", QA_URL, json_payload=payload, operation_name="QA", compress=ACCEPTS_GZIP_REQUESTS)
 
                 if qa_data:
                     st.session_state.qa_result = qa_data
+                    st.session_state.qa_result_payload = payload
                     st.success("✅ QA complete.")
                     logger.info("QA successful, results updated in session state.")
                 else:
@@ -514,7 +1040,14 @@ with tab2: # QA Tab
         st.markdown("### Static Analysis")
         static_analysis_result = st.session_state.qa_result.get("static_analysis_result", {})
         if static_analysis_result and isinstance(static_analysis_result, dict) and static_analysis_result:
-            st.json(static_analysis_result)
+            if all(isinstance(issues, list) and all(isinstance(i, dict) for i in issues) for issues in static_analysis_result.values()):
+                # {file: [finding, ...]}: one virtualized table instead of a deeply nested JSON tree
+                st.dataframe([
+                    {"File": file, "Type": i.get("type", "Issue"), "Line": i.get("line", "N/A"), "Message": i.get("msg", i.get("message", ""))}
+                    for file, issues in static_analysis_result.items() for i in issues
+                ], use_container_width=True, hide_index=True)
+            else:
+                st.json(static_analysis_result)
         elif static_analysis_result: # If it's not an empty dict but some other form of "empty"
             st.info(f"Static analysis returned: {static_analysis_result}")
         else:
@@ -522,7 +1055,7 @@ with tab2: # QA Tab
 
 with tab3: # Docs Tab
     st.subheader("📘 Auto-Generated Documentation")
-    doc_summary = st.session_state.analysis_results.get("doc_summary", "No documentation summary available. Run analysis first.")
+    doc_summary = analysis_results.get("doc_summary", "No documentation summary available. Run analysis first.")
     st.markdown(doc_summary if doc_summary else "_No documentation generated yet._")
 
 
@@ -535,7 +1068,7 @@ with tab4: # Issue Inbox Tab
     # Fetch data only if not in session_state or if explicitly cleared
     if st.session_state.inbox_data is None:
         with st.spinner("Loading inbox..."):
-            inbox_content = make_api_request("GET", INBOX_URL, operation_name="Issue Inbox")
+            inbox_content = parse_api_response(prefetched_tab_data["inbox"], INBOX_URL, operation_name="Issue Inbox")
             if inbox_content is not None: # Check if None, not just falsy
                  st.session_state.inbox_data = inbox_content
             # If inbox_content is None, an error was already shown by make_api_request
@@ -578,7 +1111,7 @@ with tab5:
     if autonomous_tab_imported and callable(show_autonomous_workflow_tab):
         logger.info("Loading Autonomous Workflow Orchestration tab content.")
         # Pass necessary parameters like BACKEND_URL if the imported function needs them
-        show_autonomous_workflow_tab(BACKEND_URL)
+        show_autonomous_workflow_tab(BACKEND_URL, session=SESSION)
     elif not autonomous_tab_imported:
         # Error message is already shown at the top of the page
         st.info("The content for this tab could not be loaded due to an import error (see details at the top of the page).")
@@ -587,18 +1120,39 @@ with tab5:
         logger.error("show_autonomous_workflow_tab is not callable.")
 
 # --- Workflow Status Tab ---
-with tab6:
-    st.subheader("🔁 Live Workflow Timeline")
-    if st.button("🔄 Refresh Status", key="refresh_status_button"):
-        st.session_state.workflow_status = None # Clear session state cache
-        st.rerun()
+def store_workflow_status(status_data):
+    """Keeps `status_data` and remembers its server timestamp for the next ?since= poll."""
+    st.session_state.workflow_status = status_data
+    if isinstance(status_data, dict) and status_data.get("last_updated"):
+        st.session_state.workflow_status_since = status_data["last_updated"]
 
-    if st.session_state.workflow_status is None:
-        with st.spinner("Loading workflow status..."):
-            status_data = make_api_request("GET", WORKFLOW_STATUS_URL, operation_name="Workflow Status")
-            if status_data is not None:
-                st.session_state.workflow_status = status_data
-            # Error handled by make_api_request
+def poll_workflow_status(since):
+    """Asks the backend for the workflow status only if it changed after `since`.
+
+    Returns the new status, or None when nothing changed (204 or {"changed": false}) or the request failed.
+    """
+    try:
+        response = SESSION.get(WORKFLOW_STATUS_URL, params={"since": since} if since else None, timeout=(HTTP_CONNECT_TIMEOUT, 10))
+    except requests.exceptions.RequestException as e:
+        response = e
+    if isinstance(response, requests.Response) and response.status_code == 204:
+        return None
+    status_data = parse_api_response(response, WORKFLOW_STATUS_URL, operation_name="Workflow Status")
+    if isinstance(status_data, dict) and status_data.get("changed") is False:
+        return None
+    return status_data
+
+def render_workflow_timeline(live_updates):
+    """Body of the workflow status tab. Runs as an st.fragment where available, so a live poll or a
+    Refresh click reruns only this function instead of the whole dashboard."""
+    if not live_updates and st.button("🔄 Refresh Status", key="refresh_status_button"):
+        status_data = poll_workflow_status(None) # No `since`: always returns the full status
+        if status_data is not None:
+            store_workflow_status(status_data)
+    elif live_updates and st.session_state.workflow_status is not None:
+        status_data = poll_workflow_status(st.session_state.workflow_status_since)
+        if status_data is not None: # Only a changed status replaces what we hold
+            store_workflow_status(status_data)
 
     workflow_status_data = st.session_state.get("workflow_status")
     if workflow_status_data:
@@ -608,8 +1162,245 @@ with tab6:
         logger.info(f"Workflow status data was present but possibly empty/unexpected: {workflow_status_data}")
     # If None, error already handled
 
+with tab6:
+    st.subheader("🔁 Live Workflow Timeline")
+    supports_fragments = hasattr(st, "fragment") # Streamlit >= 1.37
+    live_updates = (supports_fragments or st_autorefresh is not None) and st.toggle("Live updates (every 5s)", key="workflow_status_live")
+
+    if st.session_state.workflow_status is None:
+        with st.spinner("Loading workflow status..."):
+            status_data = parse_api_response(prefetched_tab_data["workflow_status"], WORKFLOW_STATUS_URL, operation_name="Workflow Status")
+            if status_data is not None:
+                store_workflow_status(status_data)
+            # Error handled by make_api_request
+
+    if supports_fragments:
+        st.fragment(run_every=WORKFLOW_STATUS_REFRESH_MS / 1000 if live_updates else None)(render_workflow_timeline)(live_updates)
+    else:
+        if live_updates:
+            st_autorefresh(interval=WORKFLOW_STATUS_REFRESH_MS, key="workflow_status_autorefresh") # Reruns the whole script
+        render_workflow_timeline(live_updates)
+
 
 # === Voice Agent Section ===
+def lowpass_fir(decimation, taps_per_phase=16):
+    """Hamming-windowed sinc anti-aliasing filter for decimating by `decimation`; cutoff at 90% of the new Nyquist."""
+    n = np.arange(decimation * taps_per_phase + 1) - decimation * taps_per_phase / 2
+    fir = np.sinc(n * 0.9 / decimation) * np.hamming(len(n))
+    return (fir / fir.sum()).astype(np.float32)
+
+class SpeechSegmenter:
+    """Cuts microphone frames into fixed-size PCM hops for the voice worker, which feeds it.
+
+    Each hop is AUDIO_HOP_SECONDS of int16 PCM. Hops are mono at ASR_SAMPLE_RATE whenever
+    the mic rate is a multiple of it (48 kHz browsers upload a third of the bytes).
+    """
+    def __init__(self):
+        self._hops = [] # Completed hops not yet handed out by feed()/flush()
+        # Detected once from the first frame (frames from one stream share a format) and reused for every
+        # hop and WAV header, so the upload matches the mic instead of assumed 16 kHz mono.
+        self.sample_rate = DEFAULT_VOICE_SAMPLE_RATE
+        self.sample_width = DEFAULT_VOICE_SAMPLE_WIDTH # Frames are always converted to s16 below
+        self.num_channels = DEFAULT_VOICE_CHANNELS
+        self._format_detected = False
+        self._is_float = False
+        self._is_planar = False
+        self._pcm = None # Preallocated int16 hop buffer, sized once the stream format is known
+        self._write = 0
+        self._input_channels = DEFAULT_VOICE_CHANNELS
+        self._decimation = 1
+        self._fir = None
+        self._fir_state = None # Last len(fir) - 1 input samples, so filtering is continuous across hops
+        self._samples_seen = 0 # Mono input samples filtered so far; keeps the decimation phase across hops
+
+    def _detect_format(self, frame):
+        self._format_detected = True
+        if frame.format.name not in AUDIO_FRAME_FORMATS:
+            logger.warning(f"Unsupported audio frame format: {frame.format.name}. Ignoring this stream.")
+            return
+        self._is_float = AUDIO_FRAME_FORMATS[frame.format.name]
+        self._is_planar = frame.format.is_planar
+        input_rate = frame.sample_rate or DEFAULT_VOICE_SAMPLE_RATE
+        self._input_channels = len(frame.layout.channels) or DEFAULT_VOICE_CHANNELS
+        self._pcm = np.empty(int(AUDIO_HOP_SECONDS * input_rate) * self._input_channels, dtype=np.int16)
+        if input_rate % ASR_SAMPLE_RATE == 0:
+            self._decimation = input_rate // ASR_SAMPLE_RATE
+            self.num_channels = 1
+        else: # Odd rates (e.g. 44.1 kHz) are passed through as captured
+            self.num_channels = self._input_channels
+        self.sample_rate = input_rate // self._decimation
+        if self._decimation > 1:
+            self._fir = lowpass_fir(self._decimation)
+            self._fir_state = np.zeros(len(self._fir) - 1, dtype=np.float32)
+        logger.info(f"Detected audio format: {frame.format.name}, {input_rate} Hz, {self._input_channels} channel(s); uploading {self.sample_rate} Hz, {self.num_channels} channel(s)")
+
+    def feed(self, frame):
+        """Buffers one av.AudioFrame and returns the hops (bytes) it completed, usually none or one."""
+        if not self._format_detected:
+            self._detect_format(frame)
+        if self._pcm is None: # Unsupported format
+            return []
+
+        samples = frame.to_ndarray()
+        if self._is_planar:
+            samples = samples.T # (channels, samples) -> interleaved
+        samples = samples.reshape(-1)
+        if self._write + samples.size > self._pcm.size:
+            self._flush()
+        dest = self._pcm[self._write:self._write + samples.size]
+        if self._is_float:
+            # Scale float samples into int16 range and cast in one vectorized pass, straight into the buffer.
+            np.multiply(samples, 2**15 - 1, out=dest, casting='unsafe')
+        else:
+            dest[:] = samples
+        self._write += samples.size
+        if self._write == self._pcm.size:
+            self._flush()
+        hops, self._hops = self._hops, []
+        return hops
+
+    def flush(self):
+        """Returns the partial hop still buffered (the tail of the last utterance), or None."""
+        self._flush()
+        return self._hops.pop() if self._hops else None
+
+    def _flush(self):
+        if self._write:
+            samples = self._pcm[:self._write]
+            if self.num_channels != self._input_channels or self._decimation > 1:
+                samples = self._downsample(samples)
+            self._hops.append(samples.tobytes())
+            self._write = 0
+
+    def _downsample(self, samples):
+        """Interleaved int16 at the mic's format -> mono int16 at self.sample_rate."""
+        mono = samples.reshape(-1, self._input_channels).mean(axis=1, dtype=np.float32)
+        if self._decimation > 1:
+            padded = np.concatenate((self._fir_state, mono))
+            self._fir_state = padded[len(mono):]
+            first = -self._samples_seen % self._decimation # Index of the next sample on the output grid
+            self._samples_seen += len(mono)
+            mono = np.convolve(padded, self._fir, mode="valid")[first::self._decimation]
+        return np.clip(np.rint(mono), -32768, 32767).astype(np.int16)
+
+
+def encode_wav(audio_buffer, sample_rate, sample_width, num_channels):
+    """Wraps raw PCM in an in-memory WAV file, rewound and ready to upload."""
+    wav_buffer = io.BytesIO()
+    with wave.open(wav_buffer, 'wb') as wav_writer:
+        wav_writer.setnchannels(num_channels)
+        wav_writer.setsampwidth(sample_width)
+        wav_writer.setframerate(sample_rate)
+        # Declaring the frame count up front lets one writeframesraw() call skip the header patch-up.
+        wav_writer.setnframes(len(audio_buffer) // (sample_width * num_channels))
+        wav_writer.writeframesraw(audio_buffer)
+    wav_buffer.seek(0)
+    return wav_buffer
+
+def send_voice_command(transcript, command_url):
+    """Sends a transcript to the agent and returns its spoken reply, if any."""
+    logger.info(f"Transcription successful: {transcript}")
+    command_response = SESSION.post(command_url, timeout=(HTTP_CONNECT_TIMEOUT, 30), **encode_json_body({"text_command": transcript}))
+    command_response.raise_for_status()
+    # Potentially trigger actions based on the response's 'action_code' etc.
+    return json_loads(command_response.content).get("spoken_text")
+
+def transcribe_utterance(audio_buffer, sample_rate, sample_width, num_channels, transcribe_url):
+    """Uploads one utterance as WAV and returns its transcript, or None if it was empty.
+
+    Runs on the voice worker thread, so it must not call any st.* functions.
+    """
+    files_payload = {"file": ("audio_segment.wav", encode_wav(audio_buffer, sample_rate, sample_width, num_channels), "audio/wav")}
+    transcribe_response = SESSION.post(transcribe_url, files=files_payload, timeout=(HTTP_CONNECT_TIMEOUT, 20)) # Timeout for transcribe
+    transcribe_response.raise_for_status()
+    transcript = json_loads(transcribe_response.content).get("transcript")
+    if not transcript:
+        logger.info("Transcription was empty.")
+        return None
+    return transcript
+
+def run_voice_worker(ctx, audio_receiver, results, stop_event, transcribe_url, command_url):
+    """Background loop: turns microphone frames from `audio_receiver` into transcripts and agent replies on `results`.
+
+    Keeps resampling, WAV encoding and backend round-trips off the Streamlit script thread. Hops are
+    grouped into ~AUDIO_PROCESSING_THRESHOLD_SECONDS utterances and uploaded as WAV files.
+    Exits on `stop_event`, or on its own once `ctx` stops playing or the receiver goes away: a closed
+    tab never reruns the script to set the event.
+    """
+    segmenter = SpeechSegmenter()
+    hops = collections.deque(maxlen=AUDIO_WINDOW_HOPS)
+    hops_per_utterance = math.ceil(AUDIO_PROCESSING_THRESHOLD_SECONDS / AUDIO_HOP_SECONDS)
+    # Agent commands run on their own thread so the next utterance is transcribed while the last
+    # command is in flight. A single thread keeps replies in the order they were spoken.
+    command_executor = ThreadPoolExecutor(max_workers=1)
+    last_command = None # Casefolded text of the last command sent
+
+    def dispatch_command(transcript):
+        nonlocal last_command
+        command = transcript.strip()
+        # Skip noise and an immediate repeat (the same words caught again by the next window): each is a full LLM call.
+        if len(command) < VOICE_MIN_COMMAND_CHARS or command.casefold() == last_command:
+            logger.info(f"Skipping voice command {command!r}: too short or a repeat of the last one.")
+            return
+        last_command = command.casefold()
+
+        def send():
+            try:
+                results.put({"transcript": command, "spoken_text": send_voice_command(command, command_url)})
+            except (requests.exceptions.RequestException, ValueError) as e:
+                logger.exception("Error sending voice command")
+                results.put({"error": str(e)})
+        command_executor.submit(send)
+
+    last_frame_at = time.monotonic()
+    while not stop_event.is_set():
+        if not ctx.state.playing or ctx.audio_receiver is not audio_receiver:
+            break # Stream stopped or restarted with a new receiver
+        try:
+            # Returns every frame that queued up while the last request was in flight.
+            frames = audio_receiver.get_frames(timeout=1)
+        except queue.Empty:
+            if time.monotonic() - last_frame_at > VOICE_IDLE_TIMEOUT_SECONDS:
+                logger.info("No audio frames received for a while; stopping the voice worker.")
+                break
+            continue
+        except Exception as e: # The receiver raises once its track has ended
+            logger.info(f"Audio receiver closed: {e}")
+            break
+        last_frame_at = time.monotonic()
+        for frame in frames:
+            hops.extend(segmenter.feed(frame))
+
+        try:
+            if len(hops) >= hops_per_utterance:
+                pcm = b"".join(hops)
+                hops.clear()
+                transcript = transcribe_utterance(pcm, segmenter.sample_rate, segmenter.sample_width, segmenter.num_channels, transcribe_url)
+                if transcript: # Silence transcribes to nothing; dropped like noise in dispatch_command
+                    dispatch_command(transcript)
+        except (requests.exceptions.RequestException, wave.Error, ValueError) as e:
+            logger.exception("Error during voice transcription/command")
+            results.put({"error": str(e)})
+
+    # The mic stopped mid-utterance: the tail is still in `hops` and the segmenter. Send it
+    # rather than dropping the last words spoken.
+    tail = segmenter.flush()
+    if tail:
+        hops.append(tail)
+    if hops:
+        try:
+            pcm = b"".join(hops)
+            transcript = transcribe_utterance(pcm, segmenter.sample_rate, segmenter.sample_width, segmenter.num_channels, transcribe_url)
+            if transcript:
+                dispatch_command(transcript)
+        except (requests.exceptions.RequestException, wave.Error, ValueError) as e:
+            logger.exception("Error transcribing the final utterance")
+            results.put({"error": str(e)})
+
+    command_executor.shutdown(wait=True) # Let in-flight commands post their replies
+    logger.info("Voice worker stopped.")
+
+
 st.markdown("---")
 st.markdown("## 🎙️ DebugIQ Voice Agent")
 st.caption("Note: Real-time voice processing in web apps can be resource-intensive. For production with many users, consider dedicated backend audio processing services.")
@@ -621,136 +1412,66 @@ try:
         key=f"voice_agent_stream_{BACKEND_URL}",
         mode=WebRtcMode.SENDONLY,
         client_settings=ClientSettings(
-            rtc_configuration={"iceServers": [{"urls": ["stun:stun.l.google.com:19302"]}]},
+            rtc_configuration=RTC_CONFIGURATION,
             media_stream_constraints={"audio": True, "video": False},
         ),
-        # audio_receiver_size is deprecated. Buffering is handled manually.
-        # send_target_rate_bits_per_sec can be used to suggest bitrate if needed
-        # desired_playing_state can be used to control play/pause from server if bidirectional
+        # SENDONLY delivers mic frames only to ctx.audio_receiver, which the voice worker drains.
+        audio_receiver_size=AUDIO_RECEIVER_FRAMES,
     )
 except Exception as e: # Catch potential errors during webrtc_streamer initialization
     st.error(f"Failed to initialize voice agent: {e}")
     logger.exception("Error initializing webrtc_streamer")
     ctx = None # Ensure ctx is None if initialization fails
 
-if ctx and ctx.audio_receiver:
-    try:
-        audio_frames = ctx.audio_receiver.get_frames(timeout=0.1) # Non-blocking with timeout
-
-        if audio_frames:
-            current_sample_rate = st.session_state.audio_sample_rate
-            current_sample_width = st.session_state.audio_sample_width
-            current_num_channels = st.session_state.audio_num_channels
-
-            # Attempt to infer audio parameters from the first frame if defaults are still set
-            # This assumes consistency across frames from the same stream source
-            first_frame_format = audio_frames[0].format
-            if first_frame_format:
-                if current_sample_rate == DEFAULT_VOICE_SAMPLE_RATE and first_frame_format.rate:
-                    st.session_state.audio_sample_rate = first_frame_format.rate
-                    logger.info(f"Inferred sample rate: {first_frame_format.rate}")
-                if current_sample_width == DEFAULT_VOICE_SAMPLE_WIDTH and first_frame_format.bytes: # This might be sample width
-                    st.session_state.audio_sample_width = first_frame_format.bytes # Usually 2 for s16
-                    logger.info(f"Inferred sample width (bytes): {first_frame_format.bytes}")
-                if current_num_channels == DEFAULT_VOICE_CHANNELS and first_frame_format.channels:
-                    st.session_state.audio_num_channels = first_frame_format.channels
-                    logger.info(f"Inferred number of channels: {first_frame_format.channels}")
-
-            for frame in audio_frames:
-                # Ensure frame is in a format we can process (e.g., s16 PCM)
-                # This part is crucial and depends heavily on the audio source format.
-                # common formats: 's16' (signed 16-bit int), 'flt' (float)
-                if frame.format.name == 's16':
-                    audio_data = frame.to_ndarray().tobytes()
-                elif frame.format.name in ['f32', 'flt32', 'flt']: # Common float formats
-                    # Convert float32 to int16. Max value of int16 is 2**15 - 1.
-                    float_array = frame.to_ndarray()
-                    int16_array = (float_array * (2**15 -1)).astype(np.int16)
-                    audio_data = int16_array.tobytes()
-                else:
-                    logger.warning(f"Unsupported audio frame format: {frame.format.name}. Skipping frame.")
-                    continue
-
-                st.session_state.audio_buffer += audio_data
-                st.session_state.audio_frame_count += frame.samples # Number of samples in this frame
-
-            st.sidebar.caption(f"Audio Buffered: {st.session_state.audio_frame_count} samples (~{st.session_state.audio_frame_count / st.session_state.audio_sample_rate:.2f}s)")
+# Start one worker per audio receiver; a new receiver means the stream was restarted.
+voice_worker = st.session_state.voice_worker
+if ctx and ctx.state.playing and ctx.audio_receiver:
+    if voice_worker is None or voice_worker["receiver"] is not ctx.audio_receiver:
+        if voice_worker:
+            voice_worker["stop"].set()
+        stop_event = threading.Event()
+        voice_thread = threading.Thread(
+            target=run_voice_worker,
+            args=(ctx, ctx.audio_receiver, st.session_state.voice_results, stop_event, TRANSCRIBE_URL, COMMAND_URL),
+            daemon=True
+        )
+        voice_thread.start()
+        st.session_state.voice_worker = {"receiver": ctx.audio_receiver, "stop": stop_event, "thread": voice_thread}
+elif voice_worker:
+    # The component is active but not receiving (e.g. user stopped the microphone). The worker is kept
+    # until its thread exits, so the results area keeps polling for the final utterance's reply.
+    voice_worker["stop"].set()
+
+def render_voice_results():
+    """Drains the worker's results into voice_history and shows it. Runs as an st.fragment where available,
+    so new transcripts appear within VOICE_RESULTS_REFRESH_MS without rerunning the whole dashboard."""
+    voice_history = st.session_state.voice_history
+    while True:
+        try:
+            voice_history.append(st.session_state.voice_results.get_nowait())
+        except queue.Empty:
+            break
+    for voice_result in voice_history:
+        if voice_result.get("error"):
+            st.error(f"Voice processing error: {voice_result['error']}")
+        else:
+            st.success(f"🗣️ You (Transcribed): \"{voice_result['transcript']}\"")
+            if voice_result.get("spoken_text"):
+                st.info(f"🤖 DebugIQ Agent: {voice_result['spoken_text']}")
+            else:
+                st.warning("Voice command sent, but no actionable response from agent.")
 
-            # Process buffer periodically
-            processing_threshold_samples = AUDIO_PROCESSING_THRESHOLD_SECONDS * st.session_state.audio_sample_rate
-            if st.session_state.audio_frame_count >= processing_threshold_samples and st.session_state.audio_buffer:
-                st.info(f"🎙️ Processing ~{st.session_state.audio_frame_count / st.session_state.audio_sample_rate:.2f}s of audio...")
-                temp_wav_file_path = None
-                try:
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_wav_file:
-                        temp_wav_file_path = tmp_wav_file.name
-
-                    with wave.open(temp_wav_file_path, 'wb') as wav_writer:
-                        wav_writer.setnchannels(st.session_state.audio_num_channels)
-                        wav_writer.setsampwidth(st.session_state.audio_sample_width)
-                        wav_writer.setframerate(st.session_state.audio_sample_rate)
-                        wav_writer.writeframes(st.session_state.audio_buffer)
-                    logger.info(f"Temporary WAV file created at {temp_wav_file_path} with {st.session_state.audio_frame_count} frames.")
-
-                    with open(temp_wav_file_path, "rb") as f_audio:
-                        files_payload = {"file": (f"audio_segment_{abs(hash(temp_wav_file_path))}.wav", f_audio, "audio/wav")} # More descriptive filename
-                        transcribe_response = requests.post(TRANSCRIBE_URL, files=files_payload, timeout=20) # Timeout for transcribe
-                    transcribe_response.raise_for_status()
-                    transcript_data = transcribe_response.json()
-                    transcript = transcript_data.get("transcript")
-
-                    if transcript:
-                        st.success(f"🗣️ You (Transcribed): \"{transcript}\"")
-                        logger.info(f"Transcription successful: {transcript}")
-                        command_response_data = make_api_request(
-                            "POST",
-                            COMMAND_URL,
-                            json_payload={"text_command": transcript},
-                            operation_name="Voice Command"
-                        )
-                        if command_response_data:
-                            st.info(f"🤖 DebugIQ Agent: {command_response_data.get('spoken_text', 'No spoken response generated.')}")
-                            # Potentially trigger actions based on command_data.get('action_code') etc.
-                        else:
-                             st.warning("Voice command sent, but no actionable response from agent.")
-                    else:
-                        st.info("Transcription returned empty. Try speaking more clearly or ensure microphone is active.")
-                        logger.info("Transcription was empty.")
+    voice_worker = st.session_state.voice_worker
+    if voice_worker and not voice_worker["thread"].is_alive() and st.session_state.voice_results.empty():
+        # Worker is done and everything it posted is shown: rerun once so polling stops.
+        st.session_state.voice_worker = None
+        st.rerun()
 
-                except requests.exceptions.RequestException as e:
-                    st.error(f"Voice processing error (API): {e}")
-                    logger.exception("Error during voice transcription/command API call")
-                except wave.Error as e:
-                    st.error(f"Could not create WAV file: {e}")
-                    logger.exception("Wave file creation error")
-                except Exception as e:
-                    st.error(f"An unexpected error occurred during voice processing: {e}")
-                    logger.exception("Unexpected error in voice processing block")
-                finally:
-                    if temp_wav_file_path and os.path.exists(temp_wav_file_path):
-                        try:
-                            os.remove(temp_wav_file_path)
-                            logger.info(f"Temporary WAV file {temp_wav_file_path} removed.")
-                        except OSError as e:
-                            logger.error(f"Error removing temporary WAV file {temp_wav_file_path}: {e}")
-                    # Clear buffer and count AFTER processing (or attempting to)
-                    st.session_state.audio_buffer = b""
-                    st.session_state.audio_frame_count = 0
-                    # st.rerun() # Might be needed if state changes should immediately reflect elsewhere
-
-    except av.error.TimeoutError: # Specifically catch av.error.TimeoutError
-        pass # Expected if no frames are available within the timeout, normal operation
-    except Exception as e:
-        # Catch other potential errors from audio_receiver or frame processing
-        if ctx and ctx.audio_receiver and not ctx.audio_receiver.is_closed: # Check if receiver is still active
-             st.warning(f"An issue occurred with the audio stream: {e}. Try restarting the voice agent if issues persist.")
-             logger.error(f"Error processing audio frames: {e}", exc_info=True)
-        # If receiver is closed, it might be user stopping it, so error might not be needed.
-
-elif ctx and not ctx.audio_receiver:
-    # This state means the component is active but not receiving (e.g., user stopped microphone)
-    if st.session_state.audio_buffer: # If there's leftover buffer when mic stops
-        logger.info("Audio stream stopped with remaining buffer. Clearing buffer.")
-        st.session_state.audio_buffer = b""
-        st.session_state.audio_frame_count = 0
-    # st.sidebar.caption("Voice agent stopped or microphone not active.") # Optional feedback
+# Poll only while a worker is running; otherwise the results area is static.
+voice_polling = st.session_state.voice_worker is not None
+if hasattr(st, "fragment"): # Streamlit >= 1.37
+    st.fragment(run_every=VOICE_RESULTS_REFRESH_MS / 1000 if voice_polling else None)(render_voice_results)()
+else:
+    if voice_polling and st_autorefresh is not None:
+        st_autorefresh(interval=VOICE_RESULTS_REFRESH_MS, key="voice_results_autorefresh") # Reruns the whole script
+    render_voice_results()
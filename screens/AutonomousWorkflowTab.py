@@ -4,12 +4,42 @@
 import streamlit as st
 import requests
 import json
+try:
+    import orjson # Native JSON decoder for backend responses
+except ImportError:
+    orjson = None # Fall back to stdlib json
 # Import os if you want to use os.getenv for BACKEND_URL fallback *within* the function
 import os # Keep if needed, but BACKEND_URL is passed in now
 
+def parse_json(data):
+    """Parses JSON bytes or str. Raises json.JSONDecodeError (orjson's error subclasses it) on bad input."""
+    return orjson.loads(data) if orjson else json.loads(data)
+
+WORKFLOW_REQUEST_TIMEOUT = (3.05, 120) # (connect, read): fail fast on a dead backend, but give agent runs time to finish
+
+def post_json(http, url, payload):
+    """POSTs `payload` as a JSON body, serialized with orjson when available."""
+    body = orjson.dumps(payload) if orjson else json.dumps(payload).encode("utf-8")
+    return http.post(url, data=body, headers={"Content-Type": "application/json"}, timeout=WORKFLOW_REQUEST_TIMEOUT)
+
+def run_workflow_action(http, url, payload, action, success_message):
+    """POSTs one workflow action and renders its JSON result, or the error."""
+    try:
+        r = post_json(http, url, payload)
+        if r.status_code in (200, 201): # PR creation might return 201 Created
+            st.success(success_message)
+            st.json(parse_json(r.content))
+        else:
+            st.error(f"{action} failed: {r.status_code}")
+            st.error(f"Response body: {r.text}")
+    except (requests.exceptions.RequestException, ValueError) as e: # ValueError: non-JSON response body
+        st.error(f"Error communicating with backend for {action}: {e}")
+
 # Define the function that renders the tab content
 # BACKEND_URL is now passed as an argument
-def show_autonomous_workflow_tab(backend_url):
+def show_autonomous_workflow_tab(backend_url, session=None):
+    """Renders the tab. Pass the dashboard's pooled requests.Session as `session` to reuse its keep-alive connections."""
+    http = session or requests # Both expose .post()
     # Define URLs *inside* the function where they are used
     # Use the passed backend_url
     TRIAGE_URL = f"{backend_url}/workflow/triage"
@@ -29,20 +59,18 @@ def show_autonomous_workflow_tab(backend_url):
     uploaded_issue_file = st.file_uploader("Upload raw issue JSON (e.g. trace or monitoring event)", type=["json"], key="ingest_issue_uploader") # Added key
     if uploaded_issue_file:
         try:
-            raw_json = json.load(uploaded_issue_file)
+            # Parse once per upload rather than on every rerun while the widget holds the file.
+            parsed = st.session_state.get("ingest_issue_parsed")
+            if parsed and parsed[0] == uploaded_issue_file.file_id:
+                raw_json = parsed[1]
+            else:
+                raw_json = parse_json(uploaded_issue_file.getvalue())
+                st.session_state.ingest_issue_parsed = (uploaded_issue_file.file_id, raw_json)
             if st.button("🚀 Triage with AI", key="triage_button"): # Added key
                 with st.spinner("Triage in progress..."):
-                    resp = requests.post(TRIAGE_URL, json={"raw_data": raw_json})
-                    if resp.status_code == 200:
-                         st.success("Triage complete!")
-                         st.json(resp.json())
-                    else:
-                         st.error(f"Triage failed: {resp.status_code}")
-                         st.error(f"Response body: {resp.text}")
+                    run_workflow_action(http, TRIAGE_URL, {"raw_data": raw_json}, "Triage", "Triage complete!")
         except json.JSONDecodeError:
             st.error("Invalid JSON file.")
-        except requests.exceptions.RequestException as e:
-            st.error(f"Error communicating with backend for triage: {e}")
 
 
     # --- Run full workflow ---
@@ -50,17 +78,8 @@ def show_autonomous_workflow_tab(backend_url):
     issue_id_full = st.text_input("Issue ID to fully auto-fix", key="workflow_full_id_input") # Added key
     if st.button("Run Full AI Workflow", key="run_full_workflow_button"): # Added key
         if issue_id_full:
-            try:
-                with st.spinner(f"Running full workflow for issue {issue_id_full}..."):
-                    resp = requests.post(RUN_WORKFLOW_URL, json={"issue_id": issue_id_full})
-                    if resp.status_code == 200:
-                         st.success(f"Full workflow triggered for Issue ID: {issue_id_full}")
-                         st.json(resp.json())
-                    else:
-                         st.error(f"Failed to trigger full workflow: {resp.status_code}")
-                         st.error(f"Response body: {resp.text}")
-            except requests.exceptions.RequestException as e:
-                 st.error(f"Error communicating with backend for full workflow: {e}")
+            with st.spinner(f"Running full workflow for issue {issue_id_full}..."):
+                run_workflow_action(http, RUN_WORKFLOW_URL, {"issue_id": issue_id_full}, "Full workflow", f"Full workflow triggered for Issue ID: {issue_id_full}")
         else:
             st.warning("Please enter an Issue ID.")
 
@@ -70,57 +89,22 @@ def show_autonomous_workflow_tab(backend_url):
     issue_id = st.text_input("Issue ID", key="manual_issue_id_input") # Added key
     patch_diff = st.text_area("Paste Patch Diff for Validation", key="manual_patch_diff_input", height=200) # Added key and height
 
-    cols = st.columns(3)
-
-    with cols[0]:
-        if st.button("🔬 Diagnose", key="diagnose_button"): # Added key
-            if issue_id:
-                try:
-                    with st.spinner(f"Diagnosing issue {issue_id}..."):
-                        r = requests.post(DIAGNOSE_URL, json={"issue_id": issue_id})
-                        if r.status_code == 200:
-                             st.success(f"Diagnosis complete for Issue ID: {issue_id}")
-                             st.json(r.json())
-                        else:
-                             st.error(f"Diagnosis failed: {r.status_code}")
-                             st.error(f"Response body: {r.text}")
-                except requests.exceptions.RequestException as e:
-                     st.error(f"Error communicating with backend for diagnose: {e}")
-            else:
-                st.warning("Please enter an Issue ID.")
-
-    with cols[1]:
-        if st.button("✅ Validate Patch", key="validate_patch_button"): # Added key
-            if issue_id and patch_diff:
-                try:
-                    with st.spinner(f"Validating patch for issue {issue_id}..."):
-                        r = requests.post(VALIDATE_URL, json={"issue_id": issue_id, "patch_diff_content": patch_diff})
-                        if r.status_code == 200:
-                            st.success(f"Validation complete for Issue ID: {issue_id}")
-                            st.json(r.json())
-                        else:
-                            st.error(f"Validation failed: {r.status_code}")
-                            st.error(f"Response body: {r.text}")
-                except requests.exceptions.RequestException as e:
-                    st.error(f"Error communicating with backend for validate: {e}")
-            else:
-                st.warning("Please enter both Issue ID and Patch Diff.")
-
-    with cols[2]:
-        if st.button("📤 Create PR", key="create_pr_button"): # Added key
-            if issue_id:
-                try:
-                    with st.spinner(f"Creating PR for issue {issue_id}..."):
-                        r = requests.post(CREATE_PR_URL, json={"issue_id": issue_id})
-                        if r.status_code == 200 or r.status_code == 201: # PR creation might return 201 Created
-                            st.success(f"PR creation triggered for Issue ID: {issue_id}")
-                            st.json(r.json())
-                        else:
-                            st.error(f"Create PR failed: {r.status_code}")
-                            st.error(f"Response body: {r.text}")
-                except requests.exceptions.RequestException as e:
-                    st.error(f"Error communicating with backend for Create PR: {e}")
-            else:
-                st.warning("Please enter an Issue ID.")
+    # (button label, key, action name, URL, payload, inputs present?, missing-input warning, success message)
+    manual_actions = [
+        ("🔬 Diagnose", "diagnose_button", "Diagnosis", DIAGNOSE_URL, {"issue_id": issue_id},
+         bool(issue_id), "Please enter an Issue ID.", f"Diagnosis complete for Issue ID: {issue_id}"),
+        ("✅ Validate Patch", "validate_patch_button", "Validation", VALIDATE_URL, {"issue_id": issue_id, "patch_diff_content": patch_diff},
+         bool(issue_id and patch_diff), "Please enter both Issue ID and Patch Diff.", f"Validation complete for Issue ID: {issue_id}"),
+        ("📤 Create PR", "create_pr_button", "Create PR", CREATE_PR_URL, {"issue_id": issue_id},
+         bool(issue_id), "Please enter an Issue ID.", f"PR creation triggered for Issue ID: {issue_id}"),
+    ]
+    for col, (label, key, action, url, payload, ready, missing_warning, success_message) in zip(st.columns(3), manual_actions):
+        with col:
+            if st.button(label, key=key):
+                if ready:
+                    with st.spinner(f"{action} in progress for issue {issue_id}..."):
+                        run_workflow_action(http, url, payload, action, success_message)
+                else:
+                    st.warning(missing_warning)
 
 # The function ends here. No st commands should be outside this function.
@@ -1,13 +1,17 @@
 import streamlit as st
 from streamlit_webrtc import webrtc_streamer, WebRtcMode, ClientSettings
-import av
 import requests
-import tempfile
+import io
+import wave
+import numpy as np
 
 # Your Gemini voice endpoint
 VOICE_API_URL = "https://debugiq-backend.onrender.com/voice/interactive"
+VOICE_REQUEST_TIMEOUT = (3.05, 60) # (connect, read): fail fast on a dead backend, but let speech synthesis finish
 
-def show_voice_assistant_tab():
+def show_voice_assistant_tab(session=None):
+    """Renders the tab. Pass the dashboard's pooled requests.Session as `session` to reuse its keep-alive connections."""
+    http = session or requests # Both expose .post()
     st.subheader("🎙️ DebugIQ Voice Agent (Gemini)")
     st.markdown("Speak to the agent. It responds with voice only. Use it to ask about patches, triage, QA, or PRs.")
 
@@ -25,20 +29,33 @@ def show_voice_assistant_tab():
         frames = ctx.audio_receiver.get_frames(timeout=3)
         if frames:
             st.info("🎤 Voice received. Processing...")
-            pcm_data = b"".join([frame.to_ndarray().tobytes() for frame in frames])
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp_wav:
-                tmp_wav.write(pcm_data)
-                tmp_wav.flush()
+            # Copy every frame's samples into one preallocated buffer instead of a bytes object per frame plus a join.
+            arrays = [frame.to_ndarray() for frame in frames]
+            pcm_data = np.empty(sum(a.size for a in arrays), dtype=arrays[0].dtype)
+            offset = 0
+            for a in arrays:
+                pcm_data[offset:offset + a.size] = a.ravel()
+                offset += a.size
+            # Build the WAV in memory: no temp file to write, read back and leak, and a real
+            # RIFF header (taken from the stream's own format) instead of bare PCM named .wav.
+            first_frame = frames[0]
+            wav_buffer = io.BytesIO()
+            with wave.open(wav_buffer, "wb") as wav_writer:
+                wav_writer.setnchannels(len(first_frame.layout.channels))
+                wav_writer.setsampwidth(first_frame.format.bytes)
+                wav_writer.setframerate(first_frame.sample_rate)
+                wav_writer.writeframes(pcm_data)
 
-                try:
-                    with open(tmp_wav.name, "rb") as f:
-                        files = {"file": f}
-                        response = requests.post(VOICE_API_URL, files=files)
-                        if response.status_code == 200:
-                            st.success("✅ Voice response from Gemini:")
-                            st.audio(response.content, format="audio/wav")
-                        else:
-                            st.error(f"Gemini voice call failed: {response.status_code}")
-                            st.text(response.text)
-                except Exception as e:
-                    st.error(f"Error communicating with Gemini voice agent: {e}")
+            try:
+                files = {"file": ("voice.wav", wav_buffer.getvalue(), "audio/wav")}
+                # Ask for Opus (~30x smaller than WAV); play whatever type the backend actually returns.
+                response = http.post(VOICE_API_URL, files=files, headers={"Accept": "audio/ogg;codecs=opus, audio/wav;q=0.5"}, timeout=VOICE_REQUEST_TIMEOUT)
+                if response.status_code == 200:
+                    st.success("✅ Voice response from Gemini:")
+                    audio_format = response.headers.get("Content-Type", "audio/wav").split(";")[0].strip()
+                    st.audio(response.content, format=audio_format if audio_format.startswith("audio/") else "audio/wav")
+                else:
+                    st.error(f"Gemini voice call failed: {response.status_code}")
+                    st.text(response.text)
+            except Exception as e:
+                st.error(f"Error communicating with Gemini voice agent: {e}")